@@ -1,13 +1,27 @@
 import streamlit as st
-import requests
 import json
 import os
-import base64
 import hashlib
+import hmac
 import pickle
+import re
+import sqlite3
+import threading
+from collections import deque
+from contextlib import contextmanager
 from io import BytesIO
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
+from types import MappingProxyType
 import time
+from argon2 import PasswordHasher
+from argon2.exceptions import InvalidHashError, VerificationError
+
+# Use orjson for faster JSON encoding when it is installed
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 # Define which voices to show for each account (customize these voice IDs with your actual voice IDs)
 ACCOUNT_VOICE_MAPPING = {
@@ -29,18 +43,96 @@ ACCOUNT_VOICE_MAPPING = {
     ],
 }
 
+ELEVENLABS_API_URL = "https://api.elevenlabs.io/v1"
+
+# Define model options
+# Separate models for TTS and voice conversion
+TTS_MODEL_OPTIONS = {
+    "Multilingual v2 (Enhanced)": "eleven_multilingual_v2",
+    "Monolingual v1 (English only)": "eleven_monolingual_v1",
+    "Multilingual v1 (Multiple languages)": "eleven_multilingual_v1",
+    "Turbo (Faster generation)": "eleven_turbo_v2",
+    "Flash v2.5 (Lowest latency)": "eleven_flash_v2_5"
+}
+
+VOICE_CONVERSION_MODEL_OPTIONS = {
+    "Multilingual Voice Conversion": "eleven_multilingual_sts_v2",
+    "English Conversion Model": "eleven_english_sts_v2"
+}
+
+# Timeouts (connect, read) in seconds for ElevenLabs API calls
+VOICES_TIMEOUT = (5, 15)
+AUDIO_TIMEOUT = (5, 120)
+
+# Audio responses are streamed in chunks of this size instead of buffered whole
+STREAM_CHUNK_SIZE = 64 * 1024
+
+# Messages longer than this are split on sentence boundaries and generated in parallel
+LONG_TEXT_CHUNK_CHARS = 400
+
+# Sentence boundaries for splitting long messages, and abbreviations that don't end a sentence
+SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?])\s+")
+ABBREVIATIONS = {"mr.", "mrs.", "ms.", "dr.", "prof.", "st.", "vs.", "etc.", "e.g.", "i.e."}
+
+# User store, plus the pickle file it replaced which is migrated on first start
+USERS_FILE = Path("data") / "users.json"
+LEGACY_USERS_FILE = Path("data") / "users.pkl"
+
+# Password hashing scheme for new hashes; users on older schemes are upgraded when they log in
+PASSWORD_HASH_ALGO = "argon2id"
+PASSWORD_HASHER = PasswordHasher(time_cost=3, memory_cost=64 * 1024, parallelism=4)
+
+# Failed logins allowed per username and per client within the window (in seconds)
+# before further attempts are refused
+LOGIN_MAX_FAILURES = 5
+LOGIN_FAILURE_WINDOW = 60
+
+# Content types of uploaded audio, by the file's first four bytes
+AUDIO_SIGNATURES = {
+    b"RIFF": "audio/wav",
+    b"OggS": "audio/ogg",
+    b"fLaC": "audio/flac",
+}
+
+# Number of recent generations kept per user for each generation type
+RECENT_GENERATIONS_LIMIT = 5
+
+# Upper bound on parallel generation requests to stay within ElevenLabs rate limits
+MAX_CONCURRENT_REQUESTS = 3
+
+# JSON helpers
+def dumps_json(data):
+    """Serialize data to compact JSON bytes, using orjson when available"""
+    if orjson is not None:
+        return orjson.dumps(data)
+    return json.dumps(data, separators=(",", ":")).encode()
+
+def loads_json(data):
+    """Parse JSON bytes, using orjson when available"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
 # Multi-account API key handling
+# The .env file is read once per process - a plain functools.cache wouldn't survive
+# reruns, since Streamlit re-executes this script and redefines the function each time
+@st.cache_resource(show_spinner=False)
+def load_env_file():
+    """Load variables from a local .env file once per process (local development only)"""
+    if not Path(".env").exists():
+        return
+    try:
+        from dotenv import load_dotenv
+        load_dotenv()
+    except ImportError:
+        pass
+
 def get_elevenlabs_accounts():
     """Get all configured ElevenLabs accounts from secrets or environment variables"""
     accounts = {}
     
     # For local development with .env file
-    try:
-        from dotenv import load_dotenv
-        if Path(".env").exists():
-            load_dotenv()
-    except ImportError:
-        pass
+    load_env_file()
     
     # Try to get accounts from Streamlit secrets
     try:
@@ -92,94 +184,260 @@ def get_elevenlabs_accounts():
 def init_authentication():
     """Initialize the authentication system"""
     # Check if we have existing session state users
-    if "users_dict" in st.session_state:
-        return st.session_state.users_dict
-    
-    # Create data directory if it doesn't exist (for local development)
-    data_dir = Path("data")
-    data_dir.mkdir(exist_ok=True)
-    
-    # Create users file if it doesn't exist
-    users_file = data_dir / "users.pkl"
-    
-    # Default admin credentials - in production, use more secure methods
-    default_username = "admin"
-    # Use environment variable for admin password if available
-    default_password = os.environ.get("ADMIN_PASSWORD", "admin123")
+    if "users" not in st.session_state:
+        st.session_state.users = load_users()
+    return st.session_state.users
+
+# Users are loaded once per process and the same dictionary is shared by every session,
+# so new visitors don't each re-read the file and accounts created by an admin are
+# visible to other sessions even where the file can't be written.
+@st.cache_resource(show_spinner=False)
+def load_users():
+    """Load the users dictionary from disk, creating the default admin if needed"""
+    if not USERS_FILE.exists():
+        # Create data directory if it doesn't exist (for local development)
+        USERS_FILE.parent.mkdir(exist_ok=True)
     
-    # Try to get from secrets if available
-    try:
-        if "admin" in st.secrets and "password" in st.secrets.admin:
-            default_password = st.secrets.admin.password
-    except:
-        pass
+    # One-time migration from the old pickle store
+    if LEGACY_USERS_FILE.exists() and not USERS_FILE.exists():
+        legacy_users = None
+        try:
+            with open(LEGACY_USERS_FILE, "rb") as f:
+                legacy_users = pickle.load(f)
+            write_users_file(legacy_users)
+            # Only drop the old file once the new one has actually been written
+            if USERS_FILE.exists():
+                LEGACY_USERS_FILE.unlink()
+        except Exception as e:
+            st.warning(f"Could not migrate users from {LEGACY_USERS_FILE}: {e}")
+        # Use the migrated users even if they couldn't be saved, the pickle file is kept for next time
+        if legacy_users is not None:
+            return legacy_users
     
-    if users_file.exists():
+    if USERS_FILE.exists():
         try:
             # Try to load from file first
-            with open(users_file, "rb") as f:
-                users = pickle.load(f)
-                st.session_state.users_dict = users
-                return users
+            return loads_json(USERS_FILE.read_bytes())
         except Exception as e:
             st.warning(f"Could not load users from file: {e}")
             # Fall back to default user
     
+    # Default admin credentials are only looked up (and hashed) when no store could be loaded
+    default_username, default_password = get_default_admin_credentials()
+    
     # Create default admin user
     admin_user = {
         "username": default_username,
-        "password_hash": hash_password(default_password),
+        **hash_new_password(default_password),
         "is_admin": True,
         "created_at": time.time()
     }
     users = {default_username: admin_user}
-    st.session_state.users_dict = users
     
     # Try to save locally for development (might fail in cloud)
-    try:
-        with open(users_file, "wb") as f:
-            pickle.dump(users, f)
-    except Exception as e:
-        pass  # Silent fail in cloud environment
+    write_users_file(users)
     
     return users
 
+def get_default_admin_credentials():
+    """Get the default admin username and password from the environment or secrets"""
+    # Default admin credentials - in production, use more secure methods
+    default_username = "admin"
+    # Use environment variable for admin password if available (including one from a local .env)
+    load_env_file()
+    default_password = os.environ.get("ADMIN_PASSWORD", "admin123")
+    
+    # Try to get from secrets if available
+    try:
+        if "admin" in st.secrets and "password" in st.secrets.admin:
+            default_password = st.secrets.admin.password
+    except:
+        pass
+    
+    return default_username, default_password
+
+def get_password_pepper():
+    """Get the optional application-wide pepper, which is kept out of the user store"""
+    load_env_file()
+    return os.environ.get("AUTH_PEPPER", "")
+
+def apply_pepper(password, pepper):
+    """Mix the pepper into the password before it is hashed"""
+    if not pepper:
+        return password
+    # Keyed BLAKE2b does the job of an HMAC in a single C call (keys are capped at 64 bytes)
+    return hashlib.blake2b(password.encode(), key=pepper.encode()[:64], digest_size=32).hexdigest()
+
 def hash_password(password):
-    """Create a SHA-256 hash of the password"""
-    return hashlib.sha256(password.encode()).hexdigest()
+    """Create an Argon2id hash of the password (the encoded hash carries its own salt and parameters)"""
+    return PASSWORD_HASHER.hash(password)
+
+def hash_new_password(password):
+    """Create the stored password fields for a user"""
+    pepper = get_password_pepper()
+    return {
+        "password_hash": hash_password(apply_pepper(password, pepper)),
+        "hash_algo": PASSWORD_HASH_ALGO,
+        "peppered": bool(pepper)
+    }
 
-def verify_password(stored_hash, provided_password):
-    """Verify that the provided password matches the stored hash"""
-    return stored_hash == hash_password(provided_password)
+def password_needs_rehash(user):
+    """Check whether a user's hash uses an older scheme, older Argon2 parameters or a missing pepper"""
+    if user.get("hash_algo") != PASSWORD_HASH_ALGO:
+        return True
+    if user.get("peppered", False) != bool(get_password_pepper()):
+        return True
+    return PASSWORD_HASHER.check_needs_rehash(user["password_hash"])
+
+def verify_password(user, provided_password):
+    """Verify that the provided password matches the user's stored hash"""
+    hash_algo = user.get("hash_algo")
+    if hash_algo == PASSWORD_HASH_ALGO:
+        pepper = get_password_pepper() if user.get("peppered") else ""
+        try:
+            return PASSWORD_HASHER.verify(user["password_hash"], apply_pepper(provided_password, pepper))
+        except (VerificationError, InvalidHashError):
+            return False
+    
+    # Users created before hash_algo was recorded have a plain SHA-256 hash,
+    # still accepted so they can log in once and be upgraded
+    provided_hash = hashlib.sha256(provided_password.encode()).hexdigest()
+    # Constant-time comparison so response timing doesn't reveal how much of the hash matched
+    return hmac.compare_digest(user["password_hash"], provided_hash)
+
+# The users dictionary is shared by all sessions, so changes to it and writes of it
+# go through one lock; re-entrant so callers can hold it around save_users
+@st.cache_resource
+def get_users_lock():
+    """Get the lock guarding the shared users dictionary"""
+    return threading.RLock()
 
 def save_users(users):
     """Save the users dictionary to session state and try to save to disk"""
-    st.session_state.users_dict = users
+    st.session_state.users = users
     # Try to save locally for development (might fail in cloud)
+    with get_users_lock():
+        write_users_file(users)
+
+def write_users_file(users):
+    """Write the users dictionary to disk, warning if it can't be saved"""
+    data = dumps_json(users)
+    tmp_file = USERS_FILE.with_suffix(".tmp")
+    try:
+        # Write to a temp file and swap it in, so a crash never leaves a truncated store
+        tmp_file.write_bytes(data)
+        os.replace(tmp_file, USERS_FILE)
+    except OSError as e:
+        # Only complain where a local data directory exists; cloud filesystems may be read-only
+        if USERS_FILE.parent.exists():
+            st.warning(f"Could not save users to {USERS_FILE}: {e}")
+
+# Hash of a random password, verified against when the username is unknown so that
+# failing takes as long as it does for a real user with a wrong password
+@st.cache_resource(show_spinner=False)
+def get_dummy_password_hash():
+    """Create a throwaway Argon2id hash, once per process"""
+    return hash_password(os.urandom(16).hex())
+
+# Recent failed logins per username and per client address, shared by all sessions
+@st.cache_resource
+def get_login_failures():
+    """Get the failed login timestamps and the lock guarding them"""
+    return {}, threading.Lock()
+
+def get_trusted_proxy_hops():
+    """Get how many reverse proxies in front of the app append to X-Forwarded-For"""
+    load_env_file()
+    try:
+        return max(int(os.environ.get("TRUSTED_PROXY_HOPS", "0")), 0)
+    except ValueError:
+        return 0
+
+def get_client_ip():
+    """Get the client address recorded by the trusted proxy, if there is one"""
+    # Entries to the left of the ones our proxies appended are sent by the client and can be
+    # forged, so without a trusted proxy there is no address to go on
+    hops = get_trusted_proxy_hops()
+    if not hops:
+        return None
     try:
-        with open(Path("data") / "users.pkl", "wb") as f:
-            pickle.dump(users, f)
+        forwarded_for = st.context.headers.get("X-Forwarded-For", "")
     except Exception:
-        pass  # Silent fail in cloud environment
+        return None
+    addresses = [address.strip() for address in forwarded_for.split(",") if address.strip()]
+    return addresses[-hops] if len(addresses) >= hops else None
+
+def get_login_keys(username):
+    """Get the keys that failed logins are counted under"""
+    keys = [("user", username)]
+    client_ip = get_client_ip()
+    if client_ip:
+        keys.append(("ip", client_ip))
+    return keys
+
+def is_login_rate_limited(username):
+    """Check whether the username or client has too many recent failed logins"""
+    failures, lock = get_login_failures()
+    cutoff = time.time() - LOGIN_FAILURE_WINDOW
+    with lock:
+        for key in get_login_keys(username):
+            attempts = failures.get(key)
+            if attempts and sum(1 for t in attempts if t > cutoff) >= LOGIN_MAX_FAILURES:
+                return True
+    return False
+
+def record_login_failure(username):
+    """Count a failed login against the username and client"""
+    failures, lock = get_login_failures()
+    now = time.time()
+    cutoff = now - LOGIN_FAILURE_WINDOW
+    with lock:
+        # Drop keys with no recent failures so guessed usernames don't pile up
+        for key in [key for key, attempts in failures.items() if attempts[-1] <= cutoff]:
+            del failures[key]
+        for key in get_login_keys(username):
+            failures.setdefault(key, deque(maxlen=LOGIN_MAX_FAILURES)).append(now)
 
 def login_user(username, password, users):
     """Attempt to log in a user"""
-    if username in users and verify_password(users[username]["password_hash"], password):
-        return True
-    return False
+    if is_login_rate_limited(username):
+        return False
+    
+    user = users.get(username)
+    if user is None:
+        verify_password({"password_hash": get_dummy_password_hash(), "hash_algo": PASSWORD_HASH_ALGO}, password)
+        record_login_failure(username)
+        return False
+    if not verify_password(user, password):
+        record_login_failure(username)
+        return False
+    
+    # Re-hash with the current scheme while we have the plaintext password
+    if password_needs_rehash(user):
+        new_hash = hash_new_password(password)
+        with get_users_lock():
+            user.update(new_hash)
+            save_users(users)
+    return True
 
 def create_user(username, password, is_admin, users):
     """Create a new user"""
     if username in users:
         return False, "Username already exists"
     
-    users[username] = {
+    # Hash before taking the lock, Argon2 is deliberately slow
+    new_user = {
         "username": username,
-        "password_hash": hash_password(password),
+        **hash_new_password(password),
         "is_admin": is_admin,
         "created_at": time.time()
     }
-    save_users(users)
+    with get_users_lock():
+        # Another session may have taken the name while we were hashing
+        if username in users:
+            return False, "Username already exists"
+        users[username] = new_user
+        save_users(users)
     return True, "User created successfully"
 
 def delete_user(username, users, current_user):
@@ -188,43 +446,175 @@ def delete_user(username, users, current_user):
     if username == current_user:
         return False, "You cannot delete your own account"
     
-    # Check if user exists
-    if username not in users:
-        return False, "User doesn't exist"
-    
-    # Delete the user
-    del users[username]
-    save_users(users)
+    with get_users_lock():
+        # Check if user exists
+        if username not in users:
+            return False, "User doesn't exist"
+        
+        # Delete the user
+        del users[username]
+        save_users(users)
     return True, f"User '{username}' deleted successfully"
 
+# Recent generations storage - audio lives in SQLite instead of session state.
+# Metadata rows only reference their audio by content hash, so the small rows that get
+# listed and trimmed stay separate from the large blobs, and identical clips are stored once.
+@st.cache_resource
+def get_generations_db():
+    """Open the shared SQLite database that stores recent generations, with the lock for its writes"""
+    data_dir = Path("data")
+    data_dir.mkdir(exist_ok=True)
+    
+    # Autocommit mode, changes that span several statements run in generations_transaction
+    conn = sqlite3.connect(data_dir / "generations.db", check_same_thread=False, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS generations (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT NOT NULL,
+            created_at REAL NOT NULL,
+            type TEXT NOT NULL,
+            voice TEXT NOT NULL,
+            model TEXT NOT NULL,
+            account TEXT NOT NULL,
+            text TEXT NOT NULL,
+            audio_id TEXT NOT NULL
+        )
+    """)
+    # Recent lists are always read and trimmed per user and type, newest first
+    conn.execute("CREATE INDEX IF NOT EXISTS generations_user_type ON generations (username, type, id)")
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS audio (
+            id TEXT PRIMARY KEY,
+            audio_data BLOB NOT NULL
+        )
+    """)
+    return conn, threading.Lock()
+
+# Every session shares the one connection, so a sequence of writes has to hold the lock
+# and run as one transaction, otherwise another session's cleanup can land in between
+@contextmanager
+def generations_transaction():
+    """Run a group of writes to the generations database as a single transaction"""
+    conn, lock = get_generations_db()
+    with lock:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+            conn.execute("COMMIT")
+        except BaseException:
+            # A failed COMMIT can leave the transaction open on the shared connection
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+
+def save_generation(username, gen_type, voice, model, account, text, audio_data):
+    """Store a generation and drop the user's older ones of the same type"""
+    audio_id = hash_audio(audio_data)
+    with generations_transaction() as conn:
+        conn.execute("INSERT OR IGNORE INTO audio (id, audio_data) VALUES (?, ?)", (audio_id, audio_data))
+        conn.execute(
+            "INSERT INTO generations (username, created_at, type, voice, model, account, text, audio_id) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (username, time.time(), gen_type, voice, model, account, text, audio_id)
+        )
+        conn.execute(
+            "DELETE FROM generations WHERE username = ? AND type = ? AND id NOT IN "
+            "(SELECT id FROM generations WHERE username = ? AND type = ? ORDER BY id DESC LIMIT ?)",
+            (username, gen_type, username, gen_type, RECENT_GENERATIONS_LIMIT)
+        )
+        delete_unused_audio(conn)
+
+def load_recent_generations(username, gen_type):
+    """Get the user's most recent generations of a type, newest first"""
+    conn, _ = get_generations_db()
+    return conn.execute(
+        "SELECT voice, model, account, text, audio_id FROM generations "
+        "WHERE username = ? AND type = ? ORDER BY id DESC LIMIT ?",
+        (username, gen_type, RECENT_GENERATIONS_LIMIT)
+    ).fetchall()
+
+def load_audio(audio_id):
+    """Get the stored audio for a generation"""
+    conn, _ = get_generations_db()
+    row = conn.execute("SELECT audio_data FROM audio WHERE id = ?", (audio_id,)).fetchone()
+    return row["audio_data"] if row else None
+
+def delete_unused_audio(conn):
+    """Remove audio that no stored generation refers to anymore (call inside generations_transaction)"""
+    conn.execute("DELETE FROM audio WHERE id NOT IN (SELECT audio_id FROM generations)")
+
+def delete_generations(username):
+    """Remove all stored generations for a user"""
+    with generations_transaction() as conn:
+        conn.execute("DELETE FROM generations WHERE username = ?", (username,))
+        delete_unused_audio(conn)
+
+# Shared HTTP session per API key so connections are kept alive between calls
+@st.cache_resource
+def get_session(api_key):
+    """Create a pooled requests session preloaded with the ElevenLabs auth headers"""
+    # requests is only needed after login, keep it off the login page's import path
+    import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+    
+    session = requests.Session()
+    session.headers.update({
+        "Accept": "application/json",
+        "xi-api-key": api_key
+    })
+    retries = Retry(
+        total=3,
+        backoff_factor=0.2,
+        status_forcelist=[429, 500, 502, 503, 504]
+    )
+    session.mount("https://", HTTPAdapter(pool_connections=10, pool_maxsize=20, max_retries=retries))
+    return session
+
+# Cached voices request, shared read-only by all sessions - raises on failure so an error is
+# never cached, and expires after ten minutes so voices added on ElevenLabs show up
+@st.cache_resource(ttl="10m", max_entries=16, show_spinner=False)
+def fetch_voices(api_key, account_name):
+    """Request the voices for an API key, filtered to the account's configured voices"""
+    url = f"{ELEVENLABS_API_URL}/voices"
+    
+    response = get_session(api_key).get(url, timeout=VOICES_TIMEOUT)
+    response.raise_for_status()
+    voices_data = response.json()
+    voices = voices_data.get("voices", [])
+    
+    # Apply filtering if we have a mapping for this account
+    if account_name in ACCOUNT_VOICE_MAPPING:
+        allowed_voice_ids = ACCOUNT_VOICE_MAPPING[account_name]
+        # Filter voices to only include the allowed ones
+        voices = [voice for voice in voices if voice["voice_id"] in allowed_voice_ids]
+    
+    # Every session shares this object, so hand out a read-only view
+    return MappingProxyType({**voices_data, "voices": tuple(voices)})
+
 # Function to get all voices for a specific account
-@st.cache_data(ttl=3600)  # Cache for one hour
 def get_voices_for_account(api_key, account_name):
     """Get all voices available for the specified API key, with optional filtering"""
-    url = "https://api.elevenlabs.io/v1/voices"
-    headers = {
-        "Accept": "application/json",
-        "xi-api-key": api_key
-    }
+    import requests
     
     try:
-        response = requests.get(url, headers=headers)
-        response.raise_for_status()
-        voices_data = response.json()
-        
-        # Apply filtering if we have a mapping for this account
-        if account_name in ACCOUNT_VOICE_MAPPING:
-            allowed_voice_ids = ACCOUNT_VOICE_MAPPING[account_name]
-            # Filter voices to only include the allowed ones
-            filtered_voices = [voice for voice in voices_data.get("voices", []) 
-                              if voice["voice_id"] in allowed_voice_ids]
-            voices_data["voices"] = filtered_voices
-        
-        return voices_data
+        return fetch_voices(api_key, account_name)
     except requests.exceptions.RequestException as e:
         st.error(f"Error fetching voices: {str(e)}")
         return {"voices": []}
 
+# Function to build the voice dropdown options for an account
+@st.cache_data(ttl="10m", max_entries=16)  # Same bounds as the voices cache
+def get_voice_index(api_key, account_name):
+    """Get the account's voice names in a stable sorted order and a name to voice ID lookup"""
+    voices = fetch_voices(api_key, account_name).get("voices", [])
+    voice_options = {voice["name"]: voice["voice_id"] for voice in voices}
+    # Built from the lookup so a name shared by several voices is only listed once
+    voice_names = tuple(sorted(voice_options))
+    return voice_names, voice_options
+
 # Function to display account information
 def show_account_info(account_name, voices_data):
     """Display information about the selected account and its voices"""
@@ -263,11 +653,8 @@ def categorize_voices(voices_data):
     
     return categories
 
-# Login page - with space theme
-def show_login_page():
-    """Show the styled login page with space theme"""
-    # Apply universal CSS at the beginning of the app
-    st.markdown("""
+# Login page CSS with space theme, built once at import instead of on every rerun
+LOGIN_CSS = """
     <style>
     /* Global app styling */
     .stApp {
@@ -469,64 +856,22 @@ def show_login_page():
         fill: #8e2de2 !important;
     }
     </style>
-    """, unsafe_allow_html=True)
-    
-    # Initialize users
-    if "users" not in st.session_state:
-        st.session_state.users = init_authentication()
-    
-    # Create a more compact centered layout
-    col1, col2, col3 = st.columns([2, 1, 2])
-    
-    with col2:
-        st.markdown('<div class="centered-content">', unsafe_allow_html=True)
-        
-        # Logo (you can replace with an actual logo)
-        st.markdown('''
-        <div class="logo-container">
-            <svg width="70" height="70" viewBox="0 0 24 24" fill="none" xmlns="http://www.w3.org/2000/svg">
-                <circle cx="12" cy="12" r="10" stroke="#aa80ff" stroke-width="2"/>
-                <path d="M8 12C8 10.8954 8.89543 10 10 10H14C15.1046 10 16 10.8954 16 12V16C16 17.1046 15.1046 18 14 18H10C8.89543 18 8 17.1046 8 16V12Z" fill="#8e2de2"/>
-                <path d="M10 7L14 7" stroke="#aa80ff" stroke-width="2" stroke-linecap="round"/>
-                <path d="M12 10V7" stroke="#aa80ff" stroke-width="2" stroke-linecap="round"/>
-            </svg>
-        </div>
-        ''', unsafe_allow_html=True)
-        
-        # Title
-        st.markdown('<h1 class="login-title">Tasty Voice Generator</h1>', unsafe_allow_html=True)
-
-        # Use a form for Enter key functionality with styled button
-        with st.form("login_form", clear_on_submit=False):
-            username = st.text_input("Username")
-            password = st.text_input("Password", type="password")
-            
-            submit_button = st.form_submit_button("Sign in", use_container_width=True)
-            
-            if submit_button:
-                if login_user(username, password, st.session_state.users):
-                    st.session_state.logged_in = True
-                    st.session_state.username = username
-                    st.session_state.is_admin = st.session_state.users[username]["is_admin"]
-                    st.success("Login successful! Redirecting...")
-                    time.sleep(1)  # Short delay for better UX
-                    st.rerun()
-                else:
-                    st.error("Invalid username or password")
-        
-        # Add the dark theme note
-        st.markdown('<div class="theme-note">💡 This app looks best in dark theme!</div>', unsafe_allow_html=True)
-        
-        # Footer
-        st.markdown('<div class="footer">© 2025 Tasty Voice Generator</div>', unsafe_allow_html=True)
-        st.markdown('</div>', unsafe_allow_html=True)  # Close the centered content
-
-def show_admin_panel():
-    """Show the admin panel for user management"""
-    st.title("Admin Control Panel")
-    
-    # Additional CSS for admin panel
-    st.markdown("""
+"""
+
+# Login page logo markup
+LOGIN_LOGO_HTML = '''
+<div class="logo-container">
+    <svg width="70" height="70" viewBox="0 0 24 24" fill="none" xmlns="http://www.w3.org/2000/svg">
+        <circle cx="12" cy="12" r="10" stroke="#aa80ff" stroke-width="2"/>
+        <path d="M8 12C8 10.8954 8.89543 10 10 10H14C15.1046 10 16 10.8954 16 12V16C16 17.1046 15.1046 18 14 18H10C8.89543 18 8 17.1046 8 16V12Z" fill="#8e2de2"/>
+        <path d="M10 7L14 7" stroke="#aa80ff" stroke-width="2" stroke-linecap="round"/>
+        <path d="M12 10V7" stroke="#aa80ff" stroke-width="2" stroke-linecap="round"/>
+    </svg>
+</div>
+'''
+
+# Additional CSS for the admin panel
+ADMIN_CSS = """
     <style>
     /* Admin panel specific styles */
     .admin-header {
@@ -572,7 +917,82 @@ def show_admin_panel():
         color: #d4c0ff !important;
     }
     </style>
-    """, unsafe_allow_html=True)
+"""
+
+# Login page - with space theme
+def show_login_page():
+    """Show the styled login page with space theme"""
+    # Apply universal CSS at the beginning of the app
+    st.markdown(LOGIN_CSS, unsafe_allow_html=True)
+    
+    # Initialize users
+    init_authentication()
+    
+    # Create a more compact centered layout
+    col1, col2, col3 = st.columns([2, 1, 2])
+    
+    with col2:
+        st.markdown('<div class="centered-content">', unsafe_allow_html=True)
+        
+        # Logo (you can replace with an actual logo)
+        st.markdown(LOGIN_LOGO_HTML, unsafe_allow_html=True)
+        
+        # Title
+        st.markdown('<h1 class="login-title">Tasty Voice Generator</h1>', unsafe_allow_html=True)
+
+        # Use a form for Enter key functionality with styled button
+        with st.form("login_form", clear_on_submit=False):
+            username = st.text_input("Username")
+            password = st.text_input("Password", type="password")
+            
+            submit_button = st.form_submit_button("Sign in", use_container_width=True)
+            
+            if submit_button:
+                if login_user(username, password, st.session_state.users):
+                    st.session_state.logged_in = True
+                    st.session_state.username = username
+                    st.session_state.is_admin = st.session_state.users[username]["is_admin"]
+                    st.session_state.just_logged_in = True
+                    # Rerun straight away instead of holding the script thread on a sleep
+                    st.rerun()
+                elif is_login_rate_limited(username):
+                    st.error(f"Too many failed attempts. Please wait {LOGIN_FAILURE_WINDOW} seconds and try again.")
+                else:
+                    st.error("Invalid username or password")
+        
+        # Add the dark theme note
+        st.markdown('<div class="theme-note">💡 This app looks best in dark theme!</div>', unsafe_allow_html=True)
+        
+        # Footer
+        st.markdown('<div class="footer">© 2025 Tasty Voice Generator</div>', unsafe_allow_html=True)
+        st.markdown('</div>', unsafe_allow_html=True)  # Close the centered content
+
+# Function to build the users table rows and the deletable users - cached on the users'
+# details, so the dates are only formatted again after a user is created or deleted
+@st.cache_data(max_entries=16, show_spinner=False)
+def build_users_table(users_signature, current_user):
+    """Build the rows for the existing users table and the users that can be deleted"""
+    rows = []
+    delete_options = []
+    for username, is_admin, created_at in users_signature:
+        rows.append({
+            "Username": username,
+            "Admin": "Yes" if is_admin else "No",
+            "Created": time.strftime("%Y-%m-%d", time.localtime(created_at))
+        })
+        # Exclude current user from the deletion options
+        if username != current_user:
+            delete_options.append(username)
+    return rows, delete_options
+
+def show_admin_panel():
+    """Show the admin panel for user management"""
+    st.title("Admin Control Panel")
+    users = st.session_state.users
+    current_user = st.session_state.username
+    
+    # Additional CSS for admin panel
+    st.markdown(ADMIN_CSS, unsafe_allow_html=True)
     
     # Go back to main app
     if st.button("Return to Voice Generator"):
@@ -594,7 +1014,7 @@ def show_admin_panel():
                 st.error("Username and password are required")
             else:
                 success, message = create_user(
-                    new_username, new_password, is_admin, st.session_state.users
+                    new_username, new_password, is_admin, users
                 )
                 if success:
                     st.success(message)
@@ -603,23 +1023,19 @@ def show_admin_panel():
     
     # Show existing users
     st.header("Existing Users")
-    users_df = []
-    for username, user in st.session_state.users.items():
-        users_df.append({
-            "Username": username,
-            "Admin": "Yes" if user["is_admin"] else "No",
-            "Created": time.strftime("%Y-%m-%d", time.localtime(user["created_at"]))
-        })
+    # Snapshot under the lock, other admin sessions may be adding or deleting users
+    with get_users_lock():
+        users_signature = tuple(
+            (username, user["is_admin"], user["created_at"])
+            for username, user in users.items()
+        )
+    users_df, delete_options = build_users_table(users_signature, current_user)
     
     st.table(users_df)
     
     # Delete user section
     st.header("Delete User")
     
-    # Exclude current user from the deletion options
-    delete_options = [username for username in st.session_state.users.keys() 
-                      if username != st.session_state.username]
-    
     if not delete_options:
         st.info("No other users to delete.")
     else:
@@ -629,30 +1045,45 @@ def show_admin_panel():
             
             if delete_button:
                 success, message = delete_user(
-                    user_to_delete, st.session_state.users, st.session_state.username
+                    user_to_delete, users, current_user
                 )
                 if success:
                     st.success(message)
                     
-                    # Clean up any user-specific data in session state
-                    user_gen_key = f"recent_generations_{user_to_delete}"
-                    if user_gen_key in st.session_state:
-                        del st.session_state[user_gen_key]
+                    # Clean up any user-specific stored generations
+                    delete_generations(user_to_delete)
                     
                     # Refresh the page after successful deletion
                     st.rerun()
                 else:
                     st.error(message)
-
-# Function to generate voice
-def generate_voice(api_key, voice_id, text, model_id, voice_settings):
-    url = f"https://api.elevenlabs.io/v1/text-to-speech/{voice_id}"
     
-    headers = {
-        "Accept": "audio/mpeg",
-        "Content-Type": "application/json",
-        "xi-api-key": api_key
-    }
+    # Cached API responses
+    st.header("Cached Audio")
+    st.write("Generated and converted audio is cached for an hour, so repeating a request doesn't use API credits again.")
+    if st.button("Clear Cached Audio"):
+        fetch_generated_voice.clear()
+        fetch_converted_voice.clear()
+        st.success("Cached audio cleared")
+
+# Function to read a streamed audio response
+def read_audio_stream(response):
+    """Collect a streamed audio response chunk by chunk as it arrives"""
+    buffer = BytesIO()
+    for chunk in response.iter_content(chunk_size=STREAM_CHUNK_SIZE):
+        buffer.write(chunk)
+    return buffer.getvalue()
+
+# Cached text-to-speech request - raises on failure so errors are never cached
+@st.cache_data(ttl=3600, max_entries=128, show_spinner=False)
+def fetch_generated_voice(api_key, voice_id, text, model_id, voice_settings):
+    """Request text-to-speech audio, reusing the cached result for identical requests"""
+    # The streaming endpoint starts sending audio before synthesis has finished
+    url = f"{ELEVENLABS_API_URL}/text-to-speech/{voice_id}/stream"
+    params = {"optimize_streaming_latency": 3}
+    
+    # Auth header comes from the shared session, only override what differs
+    headers = {"Accept": "audio/mpeg", "Content-Type": "application/json"}
     
     data = {
         "text": text,
@@ -660,70 +1091,184 @@ def generate_voice(api_key, voice_id, text, model_id, voice_settings):
         "voice_settings": voice_settings
     }
     
+    response = get_session(api_key).post(
+        url, params=params, data=dumps_json(data), headers=headers, timeout=AUDIO_TIMEOUT, stream=True
+    )
+    response.raise_for_status()
+    return read_audio_stream(response)
+
+# Function to generate voice
+def generate_voice(api_key, voice_id, text, model_id, voice_settings):
+    import requests
+    
     try:
-        response = requests.post(url, json=data, headers=headers)
-        response.raise_for_status()
-        return response.content
+        return fetch_generated_voice(api_key, voice_id, text, model_id, voice_settings)
     except requests.exceptions.RequestException as e:
         st.error(f"Error generating voice: {str(e)}")
         if hasattr(e, 'response') and e.response is not None:
             st.error(f"API response: {e.response.text}")
         return None
 
-# Function to convert voice
-def convert_voice(api_key, voice_id, audio_data, model_id, voice_settings):
-    url = f"https://api.elevenlabs.io/v1/speech-to-speech/{voice_id}"
+# Function to generate several voices at once
+def generate_voices_batch(api_key, jobs, model_id, voice_settings):
+    """Generate (voice_id, text) jobs concurrently and return the audio in job order"""
+    import requests
     
-    headers = {
-        "Accept": "audio/mpeg",
-        "xi-api-key": api_key
-    }
+    if len(jobs) == 1:
+        voice_id, text = jobs[0]
+        return [generate_voice(api_key, voice_id, text, model_id, voice_settings)]
+    
+    results = [None] * len(jobs)
+    
+    # Requests are I/O-bound, so overlap them on the pooled session's connections
+    with ThreadPoolExecutor(max_workers=min(MAX_CONCURRENT_REQUESTS, len(jobs))) as executor:
+        futures = {
+            executor.submit(fetch_generated_voice, api_key, voice_id, text, model_id, voice_settings): i
+            for i, (voice_id, text) in enumerate(jobs)
+        }
+        for future in as_completed(futures):
+            i = futures[future]
+            try:
+                results[i] = future.result()
+            except requests.exceptions.RequestException as e:
+                st.error(f"Error generating voice for message {i + 1}: {str(e)}")
+                if hasattr(e, 'response') and e.response is not None:
+                    st.error(f"API response: {e.response.text}")
+    
+    return results
+
+# Function to split text into sentences
+def split_sentences(text, min_length=10):
+    """Split text on . ! ? followed by whitespace, skipping abbreviations and very short fragments"""
+    if not text.strip():
+        return []
+    
+    sentences = []
+    current = ""
+    for part in SENTENCE_BOUNDARY.split(text.strip()):
+        current = f"{current} {part}" if current else part
+        # Keep going after an abbreviation, and on purpose also after short fragments
+        # such as "Ok." so they are merged into the next sentence rather than sent alone
+        if current.rsplit(None, 1)[-1].lower() in ABBREVIATIONS or len(current) < min_length:
+            continue
+        sentences.append(current)
+        current = ""
+    
+    # Whatever is left over (an unfinished or very short sentence) still needs to be spoken
+    if current:
+        sentences.append(current)
+    return sentences
+
+# Function to generate a long message in parallel pieces
+def generate_long_voice(api_key, voice_id, text, model_id, voice_settings):
+    """Generate long text as sentence groups in parallel and join the MP3 streams in order"""
+    chunks = []
+    for sentence in split_sentences(text):
+        if chunks and len(chunks[-1]) + len(sentence) < LONG_TEXT_CHUNK_CHARS:
+            chunks[-1] = f"{chunks[-1]} {sentence}"
+        else:
+            chunks.append(sentence)
+    
+    results = generate_voices_batch(api_key, [(voice_id, chunk) for chunk in chunks], model_id, voice_settings)
+    if not all(results):
+        return None
+    
+    # Each piece is a self-contained MP3 stream, so the frames can simply be concatenated
+    return b"".join(results)
+
+# Function to detect the content type of an uploaded audio file
+def detect_audio_content_type(audio_data):
+    """Detect the content type from the file's leading bytes, defaulting to MP3"""
+    content_type = AUDIO_SIGNATURES.get(bytes(audio_data[:4]))
+    if content_type:
+        return content_type
+    # MP4 containers (M4A) start with a 4-byte box size followed by the "ftyp" box
+    if audio_data[4:8] == b"ftyp":
+        return "audio/mp4"
+    # MP3 files (ID3 tag or bare frames) and anything unrecognised
+    return "audio/mpeg"
+
+# Cached speech-to-speech request - the upload is keyed by its digest, not its raw bytes
+@st.cache_data(ttl=3600, max_entries=128, show_spinner=False)
+def fetch_converted_voice(api_key, voice_id, audio_digest, _audio_data, model_id, voice_settings):
+    """Request speech-to-speech audio, reusing the cached result for identical requests"""
+    url = f"{ELEVENLABS_API_URL}/speech-to-speech/{voice_id}/stream"
+    
+    headers = {"Accept": "audio/mpeg"}
     
     # Handle different audio formats
-    content_type = "audio/mpeg"
-    if isinstance(audio_data, bytes):
-        # Try to detect the content type based on first few bytes
-        if audio_data.startswith(b'RIFF'):
-            content_type = "audio/wav"
-        elif audio_data.startswith(b'ID3') or audio_data.startswith(b'\xff\xfb'):
-            content_type = "audio/mpeg"
-        
     files = {
-        "audio": ("input_audio", audio_data, content_type)
+        "audio": ("input_audio", _audio_data, detect_audio_content_type(_audio_data))
     }
     
     data = {
         "model_id": model_id,
-        "voice_settings": json.dumps(voice_settings)
+        "voice_settings": dumps_json(voice_settings).decode()
     }
     
+    response = get_session(api_key).post(
+        url, headers=headers, files=files, data=data, timeout=AUDIO_TIMEOUT, stream=True
+    )
+    response.raise_for_status()
+    return read_audio_stream(response)
+
+# Function to fingerprint uploaded audio
+def hash_audio(audio_data):
+    """Create a short BLAKE2b content hash used to key cached conversions"""
+    return hashlib.blake2b(audio_data, digest_size=16).hexdigest()
+
+# Function to convert voice
+def convert_voice(api_key, voice_id, audio_data, model_id, voice_settings, audio_digest=None):
+    import requests
+    
+    if audio_digest is None:
+        audio_digest = hash_audio(audio_data)
     try:
-        response = requests.post(url, headers=headers, files=files, data=data)
-        response.raise_for_status()
-        return response.content
+        return fetch_converted_voice(api_key, voice_id, audio_digest, audio_data, model_id, voice_settings)
     except requests.exceptions.RequestException as e:
         st.error(f"Error converting voice: {str(e)}")
         if hasattr(e, 'response') and e.response is not None:
             st.error(f"API response: {e.response.text}")
         return None
 
-# Function to create download link with enhanced styling
-def get_audio_download_link(audio_data, filename="generated_voice.mp3"):
-    b64 = base64.b64encode(audio_data).decode()
-    href = f'<a href="data:audio/mpeg;base64,{b64}" download="{filename}">DOWNLOAD GENERATED AUDIO</a>'
-    return href
-
-# Main function to run the Streamlit app
-def main():
-    # Set page config
-    st.set_page_config(
-        page_title="Tasty Voice Generator",
-        page_icon="🌌",
-        layout="wide"
-    )
+# Recent generations list - a fragment so unrelated widget changes don't re-render the audio players
+@st.fragment
+def show_recent_generations(username, gen_type):
+    """Show the user's most recent generations of the given type"""
+    generations = load_recent_generations(username, gen_type)
     
-    # Apply global app CSS with space theme
-    st.markdown("""
+    if not generations:
+        st.info("Your voice recordings will appear here.")
+        return
+    
+    for i, gen in enumerate(generations):
+        label = f"{gen['voice']} ({gen['model']}) - {gen['account']}"
+        if gen_type == "voice_conversion":
+            label = f"Transformation to {label}"
+        
+        with st.expander(label, expanded=False):
+            # Only the newest clip is loaded up front; older ones wait for a click
+            loaded_key = f"recent_loaded_{gen_type}_{gen['audio_id']}"
+            if i > 0 and not st.session_state.get(loaded_key):
+                st.button(
+                    "Load audio", key=f"load_recent_{gen_type}_{i}",
+                    on_click=st.session_state.update, args=({loaded_key: True},)
+                )
+                continue
+            
+            audio_data = load_audio(gen["audio_id"])
+            if audio_data is None:
+                st.caption("This recording is no longer available.")
+                continue
+            
+            st.audio(audio_data, format="audio/mp3")
+            st.download_button(
+                "Download generated audio", data=audio_data, file_name=f"{gen['voice']}_{i}.mp3",
+                mime="audio/mpeg", key=f"download_recent_{gen_type}_{i}", on_click="ignore"
+            )
+
+# Global app CSS with space theme, built once at import instead of on every rerun
+APP_CSS = """
     <style>
     /* Global app styling */
     .stApp {
@@ -934,8 +1479,8 @@ def main():
         color: #d4c0ff !important;
     }
 
-    /* Download link styling */
-    a[download] {
+    /* Download button styling */
+    [data-testid="stDownloadButton"] > button {
         display: inline-block !important;
         background: linear-gradient(135deg, #8e2de2, #4a00e0) !important;
         color: white !important;
@@ -952,7 +1497,7 @@ def main():
         letter-spacing: 1px !important;
     }
 
-    a[download]:hover {
+    [data-testid="stDownloadButton"] > button:hover {
         background: linear-gradient(135deg, #9b4dff, #4a00e0) !important;
         transform: translateY(-2px) !important;
         box-shadow: 0 4px 15px rgba(123, 97, 255, 0.6) !important;
@@ -1080,42 +1625,71 @@ def main():
         background: linear-gradient(180deg, #9b4dff, #4a00e0);
     }
     </style>
-    """, unsafe_allow_html=True)
+"""
+
+# Tips shown at the bottom of each tab
+TTS_TIPS = """
+- For more natural sounding speech, include punctuation in your text
+- Use commas and periods to control pacing
+- Add question marks for rising intonation
+- Try different stability and similarity boost settings for different effects
+- Higher stability makes the voice more consistent but less expressive
+- Higher similarity boost makes the voice sound more like the original sample
+- Adjust speed to make speech faster or slower
+- Use style exaggeration to emphasize the unique characteristics of the voice
+"""
+
+VOICE_CONVERSION_TIPS = """
+- For best results, use high-quality audio recordings with clear speech
+- Keep the audio under 30 seconds for faster processing
+- Avoid background noise in your input audio
+- Try different voices to find the best match for your voice type
+- Adjust stability and similarity boost settings for different effects
+- Use a consistent speaking pace for more natural-sounding conversions
+- When recording your voice, speak clearly and at a consistent volume
+- For professional results, record in a quiet environment with minimal echo
+"""
+
+# Main function to run the Streamlit app
+def main():
+    # Set page config
+    st.set_page_config(
+        page_title="Tasty Voice Generator",
+        page_icon="🌌",
+        layout="wide"
+    )
+    
+    # Apply global app CSS with space theme
+    st.markdown(APP_CSS, unsafe_allow_html=True)
     
     # Check if user is logged in
     if "logged_in" not in st.session_state or not st.session_state.logged_in:
         show_login_page()
         return
     
+    # Read the logged-in user once; session state is only touched again when writing
+    username = st.session_state.username
+    is_admin = st.session_state.is_admin
+    
+    # Confirm the login without blocking - the toast fades out on its own
+    if st.session_state.pop("just_logged_in", False):
+        st.toast(f"Logged in as {username}")
+    
     # Session state variables
     if "show_admin" not in st.session_state:
         st.session_state.show_admin = False
     
     # Show admin panel if requested (and user is admin)
-    if st.session_state.show_admin and st.session_state.is_admin:
+    if st.session_state.show_admin and is_admin:
         show_admin_panel()
         return
     
-    # Define model options
-    # Separate models for TTS and voice conversion
-    tts_model_options = {
-        "Multilingual v2 (Enhanced)": "eleven_multilingual_v2",
-        "Monolingual v1 (English only)": "eleven_monolingual_v1",
-        "Multilingual v1 (Multiple languages)": "eleven_multilingual_v1",
-        "Turbo (Faster generation)": "eleven_turbo_v2"
-    }
-    
-    voice_conversion_model_options = {
-        "Multilingual Voice Conversion": "eleven_multilingual_sts_v2",
-        "English Conversion Model": "eleven_english_sts_v2"
-    }
-    
     # Store both model selections in session state
     if "tts_model" not in st.session_state:
-        st.session_state.tts_model = list(tts_model_options.keys())[0]
+        st.session_state.tts_model = list(TTS_MODEL_OPTIONS.keys())[0]
     
     if "vc_model" not in st.session_state:
-        st.session_state.vc_model = list(voice_conversion_model_options.keys())[0]
+        st.session_state.vc_model = list(VOICE_CONVERSION_MODEL_OPTIONS.keys())[0]
     
     # Get available ElevenLabs accounts
     elevenlabs_accounts = get_elevenlabs_accounts()
@@ -1130,9 +1704,9 @@ def main():
 
     # Main app sidebar
     with st.sidebar:
-        st.write(f"Logged in as: **{st.session_state.username}**")
+        st.write(f"Logged in as: **{username}**")
         
-        if st.session_state.is_admin:
+        if is_admin:
             if st.button("Control Panel"):
                 st.session_state.show_admin = True
                 st.rerun()
@@ -1175,6 +1749,15 @@ def main():
         st.markdown("---")
         st.markdown("Made with ❤️ by Ti & raffyboi")
 
+    # Prepare voice settings with all parameters, shared by both tabs
+    voice_settings = {
+        "stability": stability,
+        "similarity_boost": similarity_boost,
+        "style": style_exaggeration,
+        "speaker_boost": True,  # Always set to True
+        "speed": speed
+    }
+
     # Get available voices for the selected account with filtering
     voices_data = get_voices_for_account(current_api_key, selected_account)
     
@@ -1182,8 +1765,8 @@ def main():
         st.error(f"Could not fetch voices for account '{selected_account}'. Please check if the API key is valid or if voice IDs are correctly configured.")
         st.stop()
     
-    # Extract all voice options for dropdown
-    voice_options = {voice["name"]: voice["voice_id"] for voice in voices_data["voices"]}
+    # Get the voice names for the dropdowns and their IDs
+    voice_names, voice_options = get_voice_index(current_api_key, selected_account)
     
     # Main app title
     st.title("Tasty Voice Generator")
@@ -1201,20 +1784,23 @@ def main():
         st.header("Engine Selection")
         selected_tts_model = st.selectbox(
             "Select Text-to-Speech Engine", 
-            options=list(tts_model_options.keys()),
+            options=list(TTS_MODEL_OPTIONS.keys()),
             key="tts_model_select",
-            index=list(tts_model_options.keys()).index(st.session_state.tts_model)
+            index=list(TTS_MODEL_OPTIONS.keys()).index(st.session_state.tts_model)
         )
         st.session_state.tts_model = selected_tts_model
-        selected_tts_model_id = tts_model_options[selected_tts_model]
+        selected_tts_model_id = TTS_MODEL_OPTIONS[selected_tts_model]
         
         # Text input area
         st.header("Enter Your Message")
         text_input = st.text_area("Type or paste text here", height=150)
 
         # Voice selection
-        selected_voice_name = st.selectbox("Select Voice", options=list(voice_options.keys()))
+        selected_voice_name = st.selectbox("Select Voice", options=voice_names)
         selected_voice_id = voice_options[selected_voice_name]
+        
+        # Batch mode generates one clip per line of text
+        batch_mode = st.checkbox("Batch mode (one message per line)", key="tts_batch_mode")
 
         # Generate button
         if st.button("GENERATE VOICE", key="generate_tts"):
@@ -1222,79 +1808,72 @@ def main():
                 st.warning("Please enter some text to convert to speech.")
             else:
                 with st.spinner("Generating voice..."):
-                    # Prepare voice settings with all parameters
-                    voice_settings = {
-                        "stability": stability,
-                        "similarity_boost": similarity_boost,
-                        "style": style_exaggeration,
-                        "speaker_boost": True,  # Always set to True
-                        "speed": speed
-                    }
+                    if batch_mode:
+                        texts = [line.strip() for line in text_input.splitlines() if line.strip()]
+                        results = generate_voices_batch(
+                            current_api_key,  # Use the selected account's API key 
+                            [(selected_voice_id, text) for text in texts],
+                            selected_tts_model_id,
+                            voice_settings
+                        )
+                    elif len(text_input) > LONG_TEXT_CHUNK_CHARS:
+                        texts = [text_input]
+                        results = [generate_long_voice(
+                            current_api_key,
+                            selected_voice_id,
+                            text_input,
+                            selected_tts_model_id,
+                            voice_settings
+                        )]
+                    else:
+                        texts = [text_input]
+                        results = [generate_voice(
+                            current_api_key,
+                            selected_voice_id,
+                            text_input,
+                            selected_tts_model_id,
+                            voice_settings
+                        )]
                     
-                    audio_data = generate_voice(
-                        current_api_key,  # Use the selected account's API key 
-                        selected_voice_id, 
-                        text_input, 
-                        selected_tts_model_id,
-                        voice_settings
-                    )
-                    
-                    if audio_data:
+                    for i, (text, audio_data) in enumerate(zip(texts, results)):
+                        if not audio_data:
+                            continue
+                        
+                        file_name = "generated_voice.mp3"
+                        if len(texts) > 1:
+                            st.caption(text[:50] + "..." if len(text) > 50 else text)
+                            file_name = f"generated_voice_{i + 1}.mp3"
+
                         # Display audio player
                         st.audio(audio_data, format="audio/mp3")
-                        
+
                         # Display download link
-                        st.markdown(get_audio_download_link(audio_data), unsafe_allow_html=True)
-                        
-                        # Create a user-specific key for recent generations
-                        user_gen_key = f"recent_generations_{st.session_state.username}"
+                        st.download_button(
+                            "Download generated audio", data=audio_data, file_name=file_name,
+                            mime="audio/mpeg", key=f"download_tts_{i}", on_click="ignore"
+                        )
                         
-                        # Save recent generation info to user-specific list
-                        if user_gen_key not in st.session_state:
-                            st.session_state[user_gen_key] = []
-                            
-                        st.session_state[user_gen_key].append({
-                            "text": text_input[:50] + "..." if len(text_input) > 50 else text_input,
-                            "voice": selected_voice_name,
-                            "model": selected_tts_model,
-                            "audio_data": audio_data,
-                            "type": "tts",
-                            "account": selected_account
-                        })
+                        # Save recent generation for this user
+                        save_generation(
+                            username,
+                            "tts",
+                            selected_voice_name,
+                            selected_tts_model,
+                            selected_account,
+                            text[:50] + "..." if len(text) > 50 else text,
+                            audio_data
+                        )
 
         # Recent generations section
         st.markdown("---")
         st.header("Recent Generations")
 
-        # Get user-specific generations for TTS
-        user_gen_key = f"recent_generations_{st.session_state.username}"
-
-        if user_gen_key in st.session_state and st.session_state[user_gen_key]:
-            # Filter to show only TTS generations
-            tts_generations = [gen for gen in st.session_state[user_gen_key] if gen.get("type", "tts") == "tts"]
-            
-            if tts_generations:
-                for i, gen in enumerate(reversed(tts_generations[-5:])):  # Show last 5
-                    with st.expander(f"{gen['voice']} ({gen.get('model', 'Default Engine')}) - {gen['account']}"):
-                        st.audio(gen["audio_data"], format="audio/mp3")
-                        st.markdown(get_audio_download_link(gen["audio_data"], f"{gen['voice']}_{i}.mp3"), unsafe_allow_html=True)
-            else:
-                st.info("Your voice recordings will appear here.")
-        else:
-            st.info("Your voice recordings will appear here.")
+        # Show user-specific generations for TTS
+        show_recent_generations(username, "tts")
 
         # Tips for text-to-speech
         with st.expander("Tips for better text-to-speech"):
-            st.markdown("""
-            - For more natural sounding speech, include punctuation in your text
-            - Use commas and periods to control pacing
-            - Add question marks for rising intonation
-            - Try different stability and similarity boost settings for different effects
-            - Higher stability makes the voice more consistent but less expressive
-            - Higher similarity boost makes the voice sound more like the original sample
-            - Adjust speed to make speech faster or slower
-            - Use style exaggeration to emphasize the unique characteristics of the voice
-            """)
+            st.markdown(TTS_TIPS)
 
     with tab2:
         st.markdown("Transform your voice into another voice")
@@ -1303,20 +1882,20 @@ def main():
         st.header("Engine Selection")
         selected_vc_model = st.selectbox(
             "Select Voice Conversion Engine", 
-            options=list(voice_conversion_model_options.keys()),
+            options=list(VOICE_CONVERSION_MODEL_OPTIONS.keys()),
             key="vc_model_select",
-            index=list(voice_conversion_model_options.keys()).index(st.session_state.vc_model)
+            index=list(VOICE_CONVERSION_MODEL_OPTIONS.keys()).index(st.session_state.vc_model)
         )
         st.session_state.vc_model = selected_vc_model
-        selected_vc_model_id = voice_conversion_model_options[selected_vc_model]
+        selected_vc_model_id = VOICE_CONVERSION_MODEL_OPTIONS[selected_vc_model]
         
         # Upload audio
         st.header("Upload Audio")
-        uploaded_file = st.file_uploader("Upload an audio file (MP3, WAV, M4A)", type=["mp3", "wav", "m4a"])
+        uploaded_file = st.file_uploader("Upload an audio file (MP3, WAV, M4A, OGG, FLAC)", type=["mp3", "wav", "m4a", "ogg", "flac"])
         
         # Target voice selection
         st.header("Select Target Voice")
-        target_voice_name = st.selectbox("Voice to transform into", options=list(voice_options.keys()), key="target_voice")
+        target_voice_name = st.selectbox("Voice to transform into", options=voice_names, key="target_voice")
         target_voice_id = voice_options[target_voice_name]
         
         # Convert button
@@ -1326,20 +1905,17 @@ def main():
             else:
                 with st.spinner("Converting voice..."):
                     # Read the uploaded file
-                    audio_bytes = uploaded_file.read()
+                    audio_bytes = uploaded_file.getvalue()
+                    
+                    # Hash each upload only once, later clicks reuse the stored digest
+                    upload = st.session_state.get("voice_upload")
+                    if upload is None or upload["file_id"] != uploaded_file.file_id:
+                        upload = {"file_id": uploaded_file.file_id, "digest": hash_audio(audio_bytes)}
+                        st.session_state.voice_upload = upload
                     
                     # Display original audio
                     st.subheader("Original Voice")
-                    st.audio(audio_bytes, format=f"audio/{uploaded_file.type.split('/')[1]}")
-                    
-                    # Prepare voice settings with all parameters
-                    voice_settings = {
-                        "stability": stability,
-                        "similarity_boost": similarity_boost,
-                        "style": style_exaggeration,
-                        "speaker_boost": True,  # Always set to True
-                        "speed": speed
-                    }
+                    st.audio(audio_bytes, format=detect_audio_content_type(audio_bytes))
                     
                     # Convert voice using the specific voice conversion model
                     converted_audio = convert_voice(
@@ -1347,7 +1923,8 @@ def main():
                         target_voice_id,
                         audio_bytes,
                         selected_vc_model_id,
-                        voice_settings
+                        voice_settings,
+                        audio_digest=upload["digest"]
                     )
                     
                     if converted_audio:
@@ -1356,57 +1933,32 @@ def main():
                         st.audio(converted_audio, format="audio/mp3")
                         
                         # Display download link
-                        st.markdown(get_audio_download_link(converted_audio, f"{target_voice_name}.mp3"), unsafe_allow_html=True)
-                        
-                        # Create a user-specific key for recent conversions
-                        user_gen_key = f"recent_generations_{st.session_state.username}"
+                        st.download_button(
+                            "Download generated audio", data=converted_audio, file_name=f"{target_voice_name}.mp3",
+                            mime="audio/mpeg", key="download_vc", on_click="ignore"
+                        )
                         
-                        # Save recent conversion info to user-specific list
-                        if user_gen_key not in st.session_state:
-                            st.session_state[user_gen_key] = []
-                            
-                        st.session_state[user_gen_key].append({
-                            "text": f"Transformation to {target_voice_name}",
-                            "voice": target_voice_name,
-                            "model": selected_vc_model,
-                            "audio_data": converted_audio,
-                            "type": "voice_conversion",
-                            "account": selected_account
-                        })
+                        # Save recent conversion for this user
+                        save_generation(
+                            username,
+                            "voice_conversion",
+                            target_voice_name,
+                            selected_vc_model,
+                            selected_account,
+                            f"Transformation to {target_voice_name}",
+                            converted_audio
+                        )
         
         # Recent conversions section
         st.markdown("---")
         st.header("Recent Generations")
         
-        # Get user-specific generations for voice conversions
-        user_gen_key = f"recent_generations_{st.session_state.username}"
-        
-        if user_gen_key in st.session_state and st.session_state[user_gen_key]:
-            # Filter to show only voice conversion generations
-            voice_conversions = [gen for gen in st.session_state[user_gen_key] if gen.get("type") == "voice_conversion"]
-            
-            if voice_conversions:
-                for i, gen in enumerate(reversed(voice_conversions[-5:])):  # Show last 5
-                    with st.expander(f"Transformation to {gen['voice']} ({gen.get('model', 'Default Engine')}) - {gen['account']}"):
-                        st.audio(gen["audio_data"], format="audio/mp3")
-                        st.markdown(get_audio_download_link(gen["audio_data"], f"{gen['voice']}_{i}.mp3"), unsafe_allow_html=True)
-            else:
-                st.info("Your voice recordings will appear here.")
-        else:
-            st.info("Your voice recordings will appear here.")
+        # Show user-specific generations for voice conversions
+        show_recent_generations(username, "voice_conversion")
         
         # Tips for voice conversion
         with st.expander("Tips for better voice conversion"):
-            st.markdown("""
-            - For best results, use high-quality audio recordings with clear speech
-            - Keep the audio under 30 seconds for faster processing
-            - Avoid background noise in your input audio
-            - Try different voices to find the best match for your voice type
-            - Adjust stability and similarity boost settings for different effects
-            - Use a consistent speaking pace for more natural-sounding conversions
-            - When recording your voice, speak clearly and at a consistent volume
-            - For professional results, record in a quiet environment with minimal echo
-            """)
+            st.markdown(VOICE_CONVERSION_TIPS)
 
 if __name__ == "__main__":
     main()